@@ -1,13 +1,40 @@
 import os
 import json
 import hashlib
-import cv2
-import numpy as np
+import importlib
+import tempfile
 from datetime import datetime
 from flask import Flask, render_template, request, jsonify, send_from_directory, session, redirect, url_for
 from werkzeug.utils import secure_filename
-from PIL import Image, ImageEnhance
-import imagehash
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported on first attribute access.
+    Keeps OpenCV, NumPy, Pillow and ImageHash out of startup for workers
+    that only serve read-only routes.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+Image = LazyModule('PIL.Image')
+ImageEnhance = LazyModule('PIL.ImageEnhance')
+imagehash = LazyModule('imagehash')
+
+def preload_image_libraries():
+    """Import the image-processing stack now, e.g. from a worker's post-fork hook"""
+    for module in (cv2, np, Image, ImageEnhance, imagehash):
+        module.load()
 
 # Get the project root directory (parent of app/)
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -17,12 +44,23 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-i
 app.config['UPLOAD_FOLDER'] = os.path.join(PROJECT_ROOT, 'collection')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['DATABASE'] = os.path.join(PROJECT_ROOT, 'collection_db.json')
+app.config['JOURNAL'] = os.path.join(PROJECT_ROOT, 'collection_journal.jsonl')
+app.config['EMBEDDINGS'] = os.path.join(PROJECT_ROOT, 'collection_embeddings.npz')
 app.config['ADMIN_PASSWORD'] = os.environ.get('ADMIN_PASSWORD', 'admin')  # Change this in production!
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_SIZE = 8 * 4 * 4 + 4 * 4 * 3  # HSV histogram bins + 4x4 Lab thumbnail
+
+# In-memory copy of the embedding index, reloaded when the file changes
+_embedding_index = {'ids': [], 'fingerprints': [], 'matrix': None, 'mtime': None}
 
-# Ensure directories exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+if os.environ.get('PRELOAD_IMAGE_LIBS', '').lower() in ('1', 'true', 'yes'):
+    preload_image_libraries()
+
+def ensure_upload_folder():
+    """Create the collection folder on first write rather than at import"""
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -36,8 +74,40 @@ def load_database():
 
 def save_database(db):
     """Save the collection database"""
-    with open(app.config['DATABASE'], 'w') as f:
-        json.dump(db, f, indent=2)
+    # Write to a temp file and swap it in so readers never see a half-written file
+    path = app.config['DATABASE']
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.json.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(db, f, indent=2)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def append_journal(op, image, pixels_changed=False):
+    """
+    Append a change record to the collection journal.
+    op is 'add', 'update' or 'delete'; the full entry is stored so a
+    restore can replay records without consulting the database.
+    pixels_changed marks updates that rewrote the image file, so backups
+    only ship files whose contents changed.
+    """
+    record = {
+        'op': op,
+        'id': image['id'],
+        'filename': image['filename'],
+        'timestamp': datetime.now().isoformat(),
+        'pixels_changed': op == 'add' or pixels_changed,
+        'image': image if op != 'delete' else None
+    }
+    # The database is already saved, so a journal failure must not fail the request
+    try:
+        with open(app.config['JOURNAL'], 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    except Exception as e:
+        print(f"Error writing journal: {e}")
 
 def order_points(pts):
     """Order points in clockwise order: top-left, top-right, bottom-right, bottom-left"""
@@ -225,6 +295,192 @@ def find_similar_images(target_hashes, db, threshold=5):
 
     return sorted(similar, key=lambda x: x['distance'])
 
+def compute_image_embedding(image_path):
+    """
+    Compute a visual embedding for "more like this" search.
+    HSV colour histogram plus a tiny Lab thumbnail, L2-normalised for cosine similarity.
+    """
+    img = cv2.imread(image_path)
+    if img is None:
+        # OpenCV can't decode every format we accept (e.g. GIF)
+        try:
+            rgb = np.array(Image.open(image_path).convert('RGB'))
+        except Exception:
+            return None
+        img = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1, 2], None, [8, 4, 4], [0, 180, 0, 256, 0, 256]).flatten()
+    hist = np.sqrt(hist / max(hist.sum(), 1.0))
+
+    lab = cv2.cvtColor(cv2.resize(img, (4, 4), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2Lab)
+    layout = lab.astype('float32').flatten() / 255.0
+    layout -= layout.mean()
+
+    parts = [hist / max(np.linalg.norm(hist), 1e-6), layout / max(np.linalg.norm(layout), 1e-6)]
+    embedding = np.concatenate(parts).astype('float32')
+    return embedding / max(np.linalg.norm(embedding), 1e-6)
+
+def embedding_fingerprint(image):
+    """Identify the pixels an embedding was computed from"""
+    hashes = image.get('hashes', {})
+    return f"{hashes.get('dhash', '')}:{hashes.get('ahash', '')}:{image.get('file_size', '')}"
+
+def load_embedding_index():
+    """Load the embedding index, reusing the cached copy if the file is unchanged"""
+    path = app.config['EMBEDDINGS']
+    if not os.path.exists(path):
+        return _embedding_index
+
+    mtime = os.path.getmtime(path)
+    if _embedding_index['mtime'] != mtime:
+        try:
+            with np.load(path) as data:
+                ids = data['ids'].tolist()
+                matrix = data['matrix']
+                fingerprints = data['fingerprints'].tolist() if 'fingerprints' in data.files else [''] * len(ids)
+        except Exception as e:
+            # Treat an unreadable index as empty; build-embeddings rebuilds it
+            print(f"Error loading embedding index: {e}")
+            ids, fingerprints, matrix = [], [], None
+        _embedding_index['ids'] = ids
+        _embedding_index['fingerprints'] = fingerprints
+        _embedding_index['matrix'] = matrix
+        _embedding_index['mtime'] = mtime
+    return _embedding_index
+
+def save_embedding_index(ids, fingerprints, matrix):
+    """Save the embedding index atomically and refresh the cached copy"""
+    # Concurrent writers are last-writer-wins; build-embeddings repairs
+    # any row whose fingerprint no longer matches the database
+    path = app.config['EMBEDDINGS']
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.npz.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, ids=np.array(ids, dtype=str), fingerprints=np.array(fingerprints, dtype=str), matrix=matrix)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    _embedding_index['ids'] = list(ids)
+    _embedding_index['fingerprints'] = list(fingerprints)
+    _embedding_index['matrix'] = matrix
+    _embedding_index['mtime'] = os.path.getmtime(path)
+
+def update_embedding_index(images):
+    """Add or replace embeddings for the given image entries and save the index once"""
+    if not images:
+        return
+
+    index = load_embedding_index()
+    ids = list(index['ids'])
+    fingerprints = list(index['fingerprints'])
+    # Copy so a failed save leaves the cached index matching the file
+    matrix = None if index['matrix'] is None else index['matrix'].copy()
+    positions = {image_id: i for i, image_id in enumerate(ids)}
+
+    new_ids = []
+    new_vectors = []
+    for img in images:
+        image_path = os.path.join(app.config['UPLOAD_FOLDER'], img['filename'])
+        try:
+            embedding = compute_image_embedding(image_path)
+        except Exception as e:
+            print(f"Error embedding {img['filename']}: {e}")
+            embedding = None
+        # Unembeddable images become zero rows so they aren't retried
+        if embedding is None:
+            embedding = np.zeros(EMBEDDING_SIZE, dtype='float32')
+
+        if img['id'] in positions:
+            matrix[positions[img['id']]] = embedding
+            fingerprints[positions[img['id']]] = embedding_fingerprint(img)
+        elif img['id'] not in new_ids:
+            new_ids.append(img['id'])
+            new_vectors.append(embedding)
+            fingerprints.append(embedding_fingerprint(img))
+
+    if new_vectors:
+        batch = np.vstack(new_vectors)
+        matrix = batch if matrix is None else np.vstack([matrix, batch])
+        ids.extend(new_ids)
+
+    save_embedding_index(ids, fingerprints, matrix)
+
+def build_embedding_index(db, batch_size=EMBEDDING_BATCH_SIZE):
+    """Bring the index in line with the database, embedding in batches; returns images embedded"""
+    index = load_embedding_index()
+    current = dict(zip(index['ids'], index['fingerprints']))
+    stale = [img for img in db['images'] if current.get(img['id']) != embedding_fingerprint(img)]
+
+    # Drop rows for images that are no longer in the collection
+    image_ids = {img['id'] for img in db['images']}
+    keep = [i for i, image_id in enumerate(index['ids']) if image_id in image_ids]
+    if len(keep) < len(index['ids']):
+        save_embedding_index([index['ids'][i] for i in keep], [index['fingerprints'][i] for i in keep], index['matrix'][keep])
+
+    # Save after each batch so progress survives interruption
+    for start in range(0, len(stale), batch_size):
+        update_embedding_index(stale[start:start + batch_size])
+        print(f"Embedded {min(start + batch_size, len(stale))}/{len(stale)} images")
+
+    return len(stale)
+
+def remove_from_embedding_index(image_id):
+    """Drop an image from the embedding index"""
+    index = load_embedding_index()
+    if image_id not in index['ids']:
+        return
+
+    keep = [i for i, existing in enumerate(index['ids']) if existing != image_id]
+    save_embedding_index([index['ids'][i] for i in keep], [index['fingerprints'][i] for i in keep], index['matrix'][keep])
+
+def find_visually_similar(image_id, db, k=10):
+    """Return the k images whose embeddings are closest to image_id (reads the index only)"""
+    index = load_embedding_index()
+    if index['matrix'] is None or image_id not in index['ids']:
+        return []
+
+    ids = index['ids']
+    matrix = index['matrix']
+    query = matrix[ids.index(image_id)]
+    if not query.any():
+        return []
+
+    scores = matrix @ query
+    # Unembeddable images are zero rows; never return them
+    scores[~matrix.any(axis=1)] = -np.inf
+
+    # Over-fetch so removing the query image, stale and unembeddable ids still leaves k
+    images = {img['id']: img for img in db['images']}
+    stale = sum(1 for i in ids if i not in images)
+    excluded = int(np.isinf(scores).sum())
+    n = min(len(ids), k + 1 + stale + excluded)
+    top = np.argpartition(-scores, n - 1)[:n]
+    top = top[np.argsort(-scores[top])]
+
+    similar = []
+    for i in top:
+        if ids[i] == image_id or ids[i] not in images or np.isinf(scores[i]):
+            continue
+        img = images[ids[i]]
+        similar.append({
+            'id': img['id'],
+            'filename': img['filename'],
+            'name': img.get('name', ''),
+            'score': round(float(scores[i]), 4),
+            'tags': img['tags']
+        })
+    return similar[:k]
+
+@app.cli.command('build-embeddings')
+def build_embeddings_command():
+    """Embed new and changed images and drop deleted ones from the similarity index"""
+    count = build_embedding_index(load_database())
+    print(f"Embedding index up to date ({count} images embedded)")
+
 def require_admin():
     """Check if user is authenticated as admin"""
     if not session.get('admin_logged_in'):
@@ -304,6 +560,7 @@ def process_image():
         return jsonify({'error': 'Invalid file type'}), 400
 
     # Save file temporarily
+    ensure_upload_folder()
     temp_filename = secure_filename(file.filename)
     temp_path = os.path.join(app.config['UPLOAD_FOLDER'], 'temp_process_' + temp_filename)
     file.save(temp_path)
@@ -373,6 +630,7 @@ def upload_image():
     force_duplicate = request.form.get('force_duplicate', 'false').lower() == 'true'
 
     # Save file temporarily to process
+    ensure_upload_folder()
     temp_filename = secure_filename(file.filename)
     temp_path = os.path.join(app.config['UPLOAD_FOLDER'], 'temp_' + temp_filename)
     file.save(temp_path)
@@ -437,6 +695,12 @@ def upload_image():
 
         db['images'].append(image_entry)
         save_database(db)
+        append_journal('add', image_entry)
+
+        try:
+            update_embedding_index([image_entry])
+        except Exception as e:
+            print(f"Error updating embedding index: {e}")
 
         message = 'Image added successfully!'
         if was_processed:
@@ -472,6 +736,7 @@ def check_duplicate():
     auto_process = request.form.get('auto_process', 'true').lower() == 'true'
 
     # Save file temporarily
+    ensure_upload_folder()
     temp_filename = secure_filename(file.filename)
     temp_path = os.path.join(app.config['UPLOAD_FOLDER'], 'check_' + temp_filename)
     file.save(temp_path)
@@ -544,6 +809,7 @@ def manage_image(image_id):
             image['tags'] = data['tags']
 
         current_path = os.path.join(app.config['UPLOAD_FOLDER'], image['filename'])
+        pixels_changed = False
 
         # Apply image adjustments if provided
         if 'adjustments' in data and data['adjustments']:
@@ -556,6 +822,7 @@ def manage_image(image_id):
                 if os.path.exists(current_path):
                     try:
                         if apply_image_adjustments(current_path, brightness, contrast, rotation):
+                            pixels_changed = True
                             # Update image hashes after adjustment
                             image['hashes'] = compute_image_hash(current_path)
                             image['file_size'] = os.path.getsize(current_path)
@@ -574,6 +841,7 @@ def manage_image(image_id):
                         if os.path.exists(processed_path):
                             os.remove(current_path)
                             os.rename(processed_path, current_path)
+                            pixels_changed = True
 
                             # Update image hashes
                             image['hashes'] = compute_image_hash(current_path)
@@ -588,6 +856,14 @@ def manage_image(image_id):
 
         image['modified_date'] = datetime.now().isoformat()
         save_database(db)
+        append_journal('update', image, pixels_changed)
+
+        # Pixels changed, so the stored embedding is stale
+        if pixels_changed:
+            try:
+                update_embedding_index([image])
+            except Exception as e:
+                print(f"Error updating embedding index: {e}")
 
         return jsonify({'success': True, 'image': image})
 
@@ -599,9 +875,27 @@ def manage_image(image_id):
 
         db['images'] = [img for img in db['images'] if img['id'] != image_id]
         save_database(db)
+        append_journal('delete', image)
+
+        try:
+            remove_from_embedding_index(image_id)
+        except Exception as e:
+            print(f"Error updating embedding index: {e}")
 
         return jsonify({'success': True, 'message': 'Image deleted'})
 
+@app.route('/api/image/<image_id>/similar', methods=['GET'])
+def similar_images(image_id):
+    """Find sleeves that look like this one (colour scheme and artwork layout)"""
+    db = load_database()
+    if not any(img['id'] == image_id for img in db['images']):
+        return jsonify({'error': 'Image not found'}), 404
+
+    k = min(max(request.args.get('k', 10, type=int), 1), 100)
+    similar = find_visually_similar(image_id, db, k=k)
+
+    return jsonify({'id': image_id, 'similar': similar, 'total': len(similar)})
+
 @app.route('/api/tags', methods=['GET'])
 def get_all_tags():
     """Get all unique tags in the collection"""
@@ -0,0 +1,110 @@
+#!/bin/bash
+
+# Benchmark cold import time of app.main and src/search.py --help
+# Fails if the image-processing stack is imported eagerly or startup exceeds the budget
+# Usage: ./bin/bench-import.sh [runs]
+#   IMPORT_BUDGET_MS  Max median import time of app.main above 'import flask', from -X importtime (default 50)
+#   CLI_BUDGET_MS     Max median time of search.py --help above a bare interpreter (default 50)
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PROJECT_DIR="$(dirname "$SCRIPT_DIR")"
+cd "$PROJECT_DIR"
+
+if [ -d "venv" ]; then
+    source venv/bin/activate
+fi
+
+RUNS=${1:-5}
+IMPORT_BUDGET_MS=${IMPORT_BUDGET_MS:-50}
+CLI_BUDGET_MS=${CLI_BUDGET_MS:-50}
+HEAVY_MODULES="cv2 numpy PIL imagehash"
+FAILED=false
+
+echo "⏱️  Import benchmark (median of $RUNS runs)"
+echo ""
+
+# Import time of app.main above Flask itself, which dominates and isn't ours to budget
+if ! IMPORT_MS=$(python - "$RUNS" <<'EOF'
+import statistics
+import subprocess
+import sys
+
+runs = int(sys.argv[1])
+
+def median_import_ms(module):
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            sys.exit(1)
+        for line in result.stderr.splitlines():
+            parts = line.split('|')
+            if len(parts) == 3 and parts[2].strip() == module:
+                times.append(int(parts[1]) / 1000)
+    return statistics.median(times)
+
+print(max(0, round(median_import_ms('app.main') - median_import_ms('flask'))))
+EOF
+); then
+    echo "❌ import app.main: command failed"
+    FAILED=true
+elif [[ $IMPORT_MS -gt $IMPORT_BUDGET_MS ]]; then
+    echo "❌ import app.main: +${IMPORT_MS}ms over flask (budget ${IMPORT_BUDGET_MS}ms)"
+    FAILED=true
+else
+    echo "✅ import app.main: +${IMPORT_MS}ms over flask"
+fi
+
+# Wall-clock time of search.py --help above a bare interpreter
+if ! CLI_MS=$(python - "$RUNS" <<'EOF'
+import statistics
+import subprocess
+import sys
+import time
+
+runs = int(sys.argv[1])
+
+def median_ms(args):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, capture_output=True, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+baseline = median_ms(['-c', 'pass'])
+print(max(0, round(median_ms(['src/search.py', '--help']) - baseline)))
+EOF
+); then
+    echo "❌ src/search.py --help: command failed"
+    FAILED=true
+elif [[ $CLI_MS -gt $CLI_BUDGET_MS ]]; then
+    echo "❌ src/search.py --help: +${CLI_MS}ms over bare python (budget ${CLI_BUDGET_MS}ms)"
+    FAILED=true
+else
+    echo "✅ src/search.py --help: +${CLI_MS}ms over bare python"
+fi
+
+# Heavy modules must not be loaded just by importing the app
+if ! LOADED=$(python -c "
+import sys
+import app.main
+print(' '.join(m for m in '$HEAVY_MODULES'.split() if m in sys.modules))
+" 2>/dev/null); then
+    echo "❌ import app.main failed, cannot check eager imports"
+    FAILED=true
+elif [[ -n "$LOADED" ]]; then
+    echo "❌ import app.main eagerly loaded: $LOADED"
+    FAILED=true
+else
+    echo "✅ import app.main loads none of: $HEAVY_MODULES"
+fi
+
+echo ""
+echo "Slowest imports for app.main (python -X importtime):"
+python -X importtime -c "import app.main" 2>&1 | sort -t'|' -k2 -n -r | head -5
+
+if [[ "$FAILED" == true ]]; then
+    exit 1
+fi
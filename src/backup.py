@@ -0,0 +1,243 @@
+import io
+import os
+import sys
+import json
+import tarfile
+import argparse
+import tempfile
+from datetime import datetime
+
+# Project root (parent of src/)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATABASE_NAME = 'collection_db.json'
+JOURNAL_NAME = 'collection_journal.jsonl'
+CHECKPOINT_NAME = 'collection_journal.checkpoint'
+UPLOAD_DIR_NAME = 'collection'
+
+def load_checkpoint(project_dir):
+    """Return the last export's checkpoint: the journal file identity and byte offset"""
+    checkpoint_path = os.path.join(project_dir, CHECKPOINT_NAME)
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, 'r') as f:
+            return json.load(f)
+    return {'journal': None, 'offset': 0}
+
+def save_checkpoint(project_dir, checkpoint):
+    """Atomically record the journal position covered by an export"""
+    checkpoint_path = os.path.join(project_dir, CHECKPOINT_NAME)
+    checkpoint = dict(checkpoint, timestamp=datetime.now().isoformat())
+    fd, temp_path = tempfile.mkstemp(dir=project_dir, suffix='.checkpoint.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(temp_path, checkpoint_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def journal_identity(path):
+    """Identify a journal file across renames"""
+    st = os.stat(path)
+    return [st.st_dev, st.st_ino]
+
+def journal_segments(project_dir):
+    """Rotated journals left by failed full exports, oldest first, then the live journal"""
+    journal_path = os.path.join(project_dir, JOURNAL_NAME)
+    prefix = JOURNAL_NAME + '.'
+    rotated = sorted(name for name in os.listdir(project_dir)
+                     if name.startswith(prefix) and name[len(prefix):].isdigit())
+    segments = [os.path.join(project_dir, name) for name in rotated]
+    if os.path.exists(journal_path):
+        segments.append(journal_path)
+    return segments
+
+def read_journal(project_dir, checkpoint):
+    """
+    Read complete journal records written after checkpoint.
+    Returns the raw bytes, the parsed records and the new checkpoint.
+    """
+    segments = journal_segments(project_dir)
+    identities = [journal_identity(path) for path in segments]
+    first, offset = 0, 0
+
+    if checkpoint.get('journal'):
+        if checkpoint['journal'] not in identities:
+            raise ValueError("Checkpoint refers to a journal that no longer exists; run a --full export")
+        first = identities.index(checkpoint['journal'])
+        offset = checkpoint['offset']
+    elif checkpoint.get('offset'):
+        raise ValueError("Checkpoint does not identify its journal; run a --full export")
+
+    chunks = []
+    new_checkpoint = checkpoint
+    for path, identity in zip(segments[first:], identities[first:]):
+        with open(path, 'rb') as f:
+            if offset:
+                # The checkpoint must sit on a record boundary of this file
+                f.seek(offset - 1)
+                if f.read(1) != b'\n':
+                    raise ValueError(f"Checkpoint offset {offset} is not a record boundary in {path}; run a --full export")
+            data = f.read()
+
+        # Ignore a trailing partial line that is still being written
+        end = data.rfind(b'\n') + 1
+        chunks.append(data[:end])
+        new_checkpoint = {'journal': identity, 'offset': offset + end}
+        offset = 0
+
+    data = b''.join(chunks)
+    records = [json.loads(line) for line in data.splitlines() if line.strip()]
+    return data, records, new_checkpoint
+
+def add_bytes(tar, name, data):
+    """Add an in-memory file to the tar stream"""
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(datetime.now().timestamp())
+    tar.addfile(info, io.BytesIO(data))
+
+def changed_files(records):
+    """Return the image files an incremental snapshot must carry (adds and pixel changes)"""
+    needs_file = {}
+    for record in records:
+        if record['op'] == 'delete':
+            needs_file.pop(record['id'], None)
+        elif record['op'] == 'add' or record.get('pixels_changed', True):
+            needs_file[record['id']] = record['filename']
+    return list(needs_file.values())
+
+def export_snapshot(project_dir, output, full=False, checkpoint=True):
+    """
+    Write a full or incremental (since the last checkpoint) .tar.gz snapshot.
+    Returns (journal records, images) written.
+    """
+    upload_dir = os.path.join(project_dir, UPLOAD_DIR_NAME)
+    journal_path = os.path.join(project_dir, JOURNAL_NAME)
+
+    if full:
+        if checkpoint and os.path.exists(journal_path):
+            # Start a fresh journal before reading the database, so the database
+            # covers everything in the rotated one. If the export fails, the
+            # rotated journal is kept and read by the next incremental.
+            os.replace(journal_path, f"{journal_path}.{datetime.now().strftime('%Y%m%d%H%M%S%f')}")
+
+        db_path = os.path.join(project_dir, DATABASE_NAME)
+        with open(db_path, 'r') as f:
+            db = json.load(f)
+        filenames = [img['filename'] for img in db['images']]
+        journal_data, records, new_checkpoint = b'', [], {'journal': None, 'offset': 0}
+    else:
+        journal_data, records, new_checkpoint = read_journal(project_dir, load_checkpoint(project_dir))
+        filenames = changed_files(records)
+
+    written = 0
+    stream = sys.stdout.buffer if output == '-' else open(output, 'wb')
+    try:
+        with tarfile.open(fileobj=stream, mode='w|gz') as tar:
+            if full:
+                add_bytes(tar, DATABASE_NAME, json.dumps(db, indent=2).encode())
+            for filename in filenames:
+                image_path = os.path.join(upload_dir, filename)
+                if os.path.exists(image_path):
+                    tar.add(image_path, arcname=f"{UPLOAD_DIR_NAME}/{filename}")
+                    written += 1
+            if journal_data:
+                add_bytes(tar, 'journal.jsonl', journal_data)
+    finally:
+        if stream is not sys.stdout.buffer:
+            stream.close()
+
+    if checkpoint:
+        save_checkpoint(project_dir, new_checkpoint)
+        if full:
+            # Rotated journals predate the database we just exported
+            for path in journal_segments(project_dir):
+                if path != journal_path:
+                    os.remove(path)
+
+    kind = 'Full' if full else 'Incremental'
+    print(f"{kind} snapshot: {len(records)} journal records, {written} images written to {output}", file=sys.stderr)
+    return len(records), written
+
+def replay_journal(db, records, upload_dir):
+    """Apply journal records to the database in order"""
+    images = {img['id']: img for img in db['images']}
+
+    for record in records:
+        if record['op'] == 'delete':
+            images.pop(record['id'], None)
+            image_path = os.path.join(upload_dir, os.path.basename(record['filename']))
+            if os.path.exists(image_path):
+                os.remove(image_path)
+        else:
+            images[record['id']] = record['image']
+
+    db['images'] = list(images.values())
+    return db
+
+def restore_snapshot(project_dir, archive):
+    """Restore a snapshot produced by export_snapshot on top of project_dir"""
+    upload_dir = os.path.join(project_dir, UPLOAD_DIR_NAME)
+    db_path = os.path.join(project_dir, DATABASE_NAME)
+    os.makedirs(upload_dir, exist_ok=True)
+
+    stream = sys.stdin.buffer if archive == '-' else open(archive, 'rb')
+    db = None
+    records = []
+    restored = 0
+
+    try:
+        with tarfile.open(fileobj=stream, mode='r|gz') as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                data = tar.extractfile(member).read()
+
+                if member.name == DATABASE_NAME:
+                    db = json.loads(data)
+                elif member.name == 'journal.jsonl':
+                    records = [json.loads(line) for line in data.splitlines() if line.strip()]
+                elif member.name.startswith(UPLOAD_DIR_NAME + '/'):
+                    # Never trust paths from the archive
+                    filename = os.path.basename(member.name)
+                    with open(os.path.join(upload_dir, filename), 'wb') as f:
+                        f.write(data)
+                    restored += 1
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+    if db is None:
+        if os.path.exists(db_path):
+            with open(db_path, 'r') as f:
+                db = json.load(f)
+        else:
+            db = {'images': []}
+
+    db = replay_journal(db, records, upload_dir)
+    with open(db_path, 'w') as f:
+        json.dump(db, f, indent=2)
+
+    print(f"Restored {restored} images, replayed {len(records)} journal records from {archive}", file=sys.stderr)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental backup and restore of the sleeve collection.")
+    parser.add_argument("--project-dir", type=str, default=PROJECT_ROOT, help="Directory holding collection/ and the database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write a snapshot as a .tar.gz stream")
+    export_parser.add_argument("output", type=str, help="Output file, or - for stdout")
+    export_parser.add_argument("--full", action="store_true", help="Export the whole collection and start a new journal")
+    export_parser.add_argument("--no-checkpoint", action="store_true", help="One-off export that does not advance the checkpoint or rotate the journal")
+
+    restore_parser = subparsers.add_parser("restore", help="Apply snapshots in the order given")
+    restore_parser.add_argument("archives", type=str, nargs="+", help="Snapshot files, or - for stdin")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export_snapshot(args.project_dir, args.output, args.full, checkpoint=not args.no_checkpoint)
+    else:
+        for archive in args.archives:
+            restore_snapshot(args.project_dir, archive)
@@ -1,8 +1,10 @@
-import cv2
 import os
 import argparse
 
 def search_and_highlight(directory_path, target_image_path, threshold=0.95):
+    # Imported here so --help and argument errors don't pay for OpenCV
+    import cv2
+
     # Load the target image
     target = cv2.imread(target_image_path)
     if target is None: